@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+#
+import sys
+import argparse
+import inspect
+import io
+import json
+import os
+import shutil
+import subprocess
+import tarfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import setup
+from setup import log, mk_path, file_sha256, get_manifest_hash, DIST_MANIFEST
+
+MANIFEST_VERSION = 1
+
+def run():
+    description = 'Package TON install tree into versioned artifact, publish it into artifact store and install it into targets'
+    parser = argparse.ArgumentParser(formatter_class = argparse.RawDescriptionHelpFormatter,
+                                     description = description)
+
+    parser.add_argument('-m', '--mode',
+                        required=True,
+                        type=str,
+                        dest='mode',
+                        action='store',
+                        help='[pack|publish|install] - REQUIRED')
+
+    parser.add_argument('-i', '--install-path',
+                        required=False,
+                        type=str,
+                        dest='install_path',
+                        action='store',
+                        help='Install tree to package (INSTALL_PATH of build.sh), pack mode - REQUIRED for pack')
+
+    parser.add_argument('-o', '--output',
+                        required=False,
+                        type=str,
+                        dest='output',
+                        action='store',
+                        help='Directory to write artifact into, pack mode - REQUIRED for pack')
+
+    parser.add_argument('--commit',
+                        required=False,
+                        type=str,
+                        default='unknown',
+                        dest='commit',
+                        action='store',
+                        help='TON repository commit the tree was built from, pack mode - OPTIONAL')
+
+    parser.add_argument('--build-flags',
+                        required=False,
+                        type=str,
+                        default='',
+                        dest='build_flags',
+                        action='store',
+                        help='Build configuration flags the tree was built with, pack mode - OPTIONAL')
+
+    parser.add_argument('-a', '--artifact',
+                        required=False,
+                        type=str,
+                        dest='artifact',
+                        action='store',
+                        help='Artifact file, or artifact hash (prefix) in store for install mode - REQUIRED for publish and install')
+
+    parser.add_argument('-s', '--store',
+                        required=False,
+                        type=str,
+                        dest='store',
+                        action='store',
+                        help='Local artifact store path - REQUIRED for publish and install')
+
+    parser.add_argument('-t', '--target',
+                        required=False,
+                        type=str,
+                        dest='targets',
+                        action='append',
+                        default=[],
+                        help='Target distribution path to install artifact into, can be repeated - REQUIRED for install')
+
+    parser.add_argument('--threads',
+                        required=False,
+                        type=int,
+                        default=os.cpu_count(),
+                        dest='threads',
+                        action='store',
+                        help='Number of parallel file transfers - OPTIONAL, defaults to number of cores')
+
+    parser.add_argument('--zstd-bin',
+                        required=False,
+                        type=str,
+                        default=shutil.which('zstd'),
+                        dest='zstd_bin',
+                        action='store',
+                        help='zstd binary - OPTIONAL')
+
+    parser.add_argument('--zstd-level',
+                        required=False,
+                        type=int,
+                        default=19,
+                        dest='zstd_level',
+                        action='store',
+                        help='zstd compression level - OPTIONAL, defaults to 19')
+
+    parser.add_argument('-v', '--verbosity',
+                        required=False,
+                        type=int,
+                        dest='verbosity',
+                        action='store',
+                        default=3,
+                        help='Verbosity for this script - OPTIONAL')
+
+    args = parser.parse_args()
+    setup.verbosity = args.verbosity
+
+    if args.mode not in ('pack', 'publish', 'install'):
+        log(inspect.currentframe().f_code.co_name, 1, "Unknown mode '{}'".format(args.mode))
+        sys.exit(1)
+    elif args.mode in ('pack', 'publish') and (not args.zstd_bin or not os.path.isfile(args.zstd_bin)):
+        log(inspect.currentframe().f_code.co_name, 1, "zstd binary cannot be found")
+        sys.exit(1)
+    elif args.mode == 'pack' and (not args.install_path or not args.output):
+        log(inspect.currentframe().f_code.co_name, 1, "Install path and output are required for pack")
+        sys.exit(1)
+    elif args.mode == 'publish' and (not args.artifact or not args.store):
+        log(inspect.currentframe().f_code.co_name, 1, "Artifact and store are required for publish")
+        sys.exit(1)
+    elif args.mode == 'install' and (not args.artifact or not args.store or not args.targets):
+        log(inspect.currentframe().f_code.co_name, 1, "Artifact, store and at least one target are required for install")
+        sys.exit(1)
+
+    try:
+        if args.mode == 'pack':
+            pack(args)
+        elif args.mode == 'publish':
+            publish(args)
+        else:
+            install(args)
+    except Exception as e:
+        log(inspect.currentframe().f_code.co_name, 1, "{} failed: {}".format(args.mode, e))
+        sys.exit(1)
+
+def pack(args):
+    install_path = args.install_path.rstrip('/')
+    log(inspect.currentframe().f_code.co_name, 3, "Building manifest of {}".format(install_path))
+    manifest = mk_manifest(install_path, args.threads)
+    manifest['commit'] = args.commit
+    manifest['build_flags'] = args.build_flags
+    manifest['created'] = int(time.time())
+
+    mk_path(args.output)
+    basename = "{}/{}".format(args.output.rstrip('/'), get_artifact_name(manifest))
+    log(inspect.currentframe().f_code.co_name, 3, "Writing artifact {}.tar.zst with {} files".format(basename, len(manifest['files'])))
+    manifest_data = json.dumps(manifest, indent=4).encode()
+    with open("{}.tar.zst".format(basename), 'wb') as fh:
+        process = subprocess.Popen([args.zstd_bin, "-q", "-T0", "-{}".format(args.zstd_level), "-c"],
+                                   stdin=subprocess.PIPE, stdout=fh)
+        with tarfile.open(fileobj=process.stdin, mode='w|') as tar:
+            info = tarfile.TarInfo(DIST_MANIFEST)
+            info.size = len(manifest_data)
+            info.mtime = manifest['created']
+            tar.addfile(info, io.BytesIO(manifest_data))
+            for name in sorted(manifest['files']):
+                tar.add("{}/{}".format(install_path, name), arcname=name, recursive=False)
+
+        process.stdin.close()
+        if process.wait() > 0:
+            raise Exception("zstd compression failed")
+
+    with open("{}.manifest.json".format(basename), 'wb') as fh:
+        fh.write(manifest_data)
+
+    with open("{}/{}".format(install_path, DIST_MANIFEST), 'wb') as fh:
+        fh.write(manifest_data)
+
+    log(inspect.currentframe().f_code.co_name, 3, "Artifact hash {}".format(manifest['hash']))
+
+def publish(args):
+    manifest = read_manifest(args.artifact)
+    store = args.store.rstrip('/')
+    name = get_artifact_name(manifest)
+    mk_path("{}/artifacts".format(store))
+
+    target = "{}/artifacts/{}.tar.zst".format(store, name)
+    if os.path.isfile(target) and os.path.isfile("{}/artifacts/{}.manifest.json".format(store, name)):
+        log(inspect.currentframe().f_code.co_name, 3, "Artifact {} already in store".format(name))
+    else:
+        log(inspect.currentframe().f_code.co_name, 3, "Copying artifact {} into store".format(name))
+        shutil.copyfile(args.artifact, "{}.tmp".format(target))
+        os.replace("{}.tmp".format(target), target)
+        with open("{}/artifacts/{}.manifest.json".format(store, name), 'w') as fh:
+            fh.write(json.dumps(manifest, indent=4))
+
+    tree = "{}/trees/{}".format(store, manifest['hash'])
+    if os.path.isdir(tree):
+        log(inspect.currentframe().f_code.co_name, 3, "Artifact tree {} already unpacked".format(tree))
+        return
+
+    log(inspect.currentframe().f_code.co_name, 3, "Unpacking artifact into {}".format(tree))
+    if os.path.exists("{}.tmp".format(tree)):
+        shutil.rmtree("{}.tmp".format(tree))
+
+    try:
+        mk_path("{}.tmp".format(tree))
+        process = subprocess.Popen([args.zstd_bin, "-q", "-d", "-c", target], stdout=subprocess.PIPE)
+        with tarfile.open(fileobj=process.stdout, mode='r|') as tar:
+            if hasattr(tarfile, 'data_filter'):
+                tar.extractall("{}.tmp".format(tree), filter='data')
+            else:
+                tar.extractall("{}.tmp".format(tree))
+
+        if process.wait() > 0:
+            raise Exception("zstd decompression failed")
+
+        # Extraction filter clears group / other write bits, modes are applied from manifest on install
+        unpacked = mk_manifest("{}.tmp".format(tree), args.threads)
+        if strip_modes(unpacked['files']) != strip_modes(manifest['files']):
+            raise Exception("unpacked tree does not match manifest {}".format(manifest['hash']))
+
+        os.rename("{}.tmp".format(tree), tree)
+    except Exception:
+        shutil.rmtree("{}.tmp".format(tree), ignore_errors=True)
+        raise
+
+def install(args):
+    store = args.store.rstrip('/')
+    manifest, tree = find_artifact(store, args.artifact)
+    log(inspect.currentframe().f_code.co_name, 3, "Installing artifact {} into {} targets".format(get_artifact_name(manifest), len(args.targets)))
+
+    jobs = []
+    removals = []
+    for target in args.targets:
+        target = target.rstrip('/')
+        installed = {'files': {}}
+        if os.path.isfile("{}/{}".format(target, DIST_MANIFEST)):
+            with open("{}/{}".format(target, DIST_MANIFEST), 'r') as fh:
+                installed = json.loads(fh.read())
+
+        changed = []
+        for name, element in manifest['files'].items():
+            path = "{}/{}".format(target, name)
+            if installed['files'].get(name) != element or not os.path.lexists(path):
+                changed.append(name)
+            elif 'link' not in element and os.path.getsize(path) != element['size']:
+                changed.append(name)
+
+        obsolete = [name for name in installed['files'] if name not in manifest['files']]
+        log(inspect.currentframe().f_code.co_name, 3, "{}: {} files to transfer, {} unchanged, {} to remove".format(
+            target, len(changed), len(manifest['files']) - len(changed), len(obsolete)))
+        jobs += [[tree, target, name, manifest['files'][name]] for name in changed]
+        removals += ["{}/{}".format(target, name) for name in obsolete]
+
+    # Parent directories are created up front, concurrent workers would race creating shared ones
+    for path in sorted(set([os.path.dirname("{}/{}".format(job[1], job[2])) for job in jobs])):
+        mk_path(path)
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=max(args.threads, 1)) as executor:
+        result = list(executor.map(lambda job: install_file(*job), jobs))
+
+    for path in removals:
+        if os.path.lexists(path):
+            os.remove(path)
+
+    for target in args.targets:
+        with open("{}/{}".format(target.rstrip('/'), DIST_MANIFEST), 'w') as fh:
+            fh.write(json.dumps(manifest, indent=4))
+
+    log(inspect.currentframe().f_code.co_name, 3, "Transferred {} files, {} bytes in {:.1f} seconds".format(
+        len(result), sum(result), time.time() - start))
+
+def install_file(tree, target, name, element):
+    path = "{}/{}".format(target, name)
+    if 'link' in element:
+        if os.path.lexists(path):
+            os.remove(path)
+        os.symlink(element['link'], path)
+        return 0
+
+    # Replace instead of overwriting in place, binaries may be running
+    shutil.copyfile("{}/{}".format(tree, name), "{}.tmp".format(path))
+    os.chmod("{}.tmp".format(path), element['mode'])
+    os.replace("{}.tmp".format(path), path)
+    return element['size']
+
+def mk_manifest(path, threads=1):
+    names = []
+    links = {}
+    for root, dirs, files in os.walk(path):
+        for element in dirs + files:
+            full_path = os.path.join(root, element)
+            name = os.path.relpath(full_path, path)
+            if name == DIST_MANIFEST:
+                continue
+            elif os.path.islink(full_path):
+                links[name] = {'link': os.readlink(full_path)}
+            elif os.path.isfile(full_path):
+                names.append(name)
+
+    with ThreadPoolExecutor(max_workers=max(threads, 1)) as executor:
+        hashes = list(executor.map(lambda name: file_sha256(os.path.join(path, name)), names))
+
+    files = dict(links)
+    for name, sha256 in zip(names, hashes):
+        stat = os.stat(os.path.join(path, name))
+        files[name] = {'sha256': sha256, 'size': stat.st_size, 'mode': stat.st_mode & 0o7777}
+
+    return {
+        'version': MANIFEST_VERSION,
+        'hash': get_manifest_hash(files),
+        'files': files
+    }
+
+def strip_modes(files):
+    return {name: {key: value for key, value in element.items() if key != 'mode'} for name, element in files.items()}
+
+def read_manifest(artifact):
+    manifest_file = artifact
+    if artifact.endswith('.tar.zst'):
+        manifest_file = "{}.manifest.json".format(artifact[:-len('.tar.zst')])
+    with open(manifest_file, 'r') as fh:
+        manifest = json.loads(fh.read())
+
+    if get_manifest_hash(manifest['files']) != manifest['hash']:
+        raise Exception("manifest {} is corrupted".format(manifest_file))
+
+    return manifest
+
+def find_artifact(store, artifact):
+    if os.path.isfile(artifact):
+        manifest = read_manifest(artifact)
+    else:
+        candidates = []
+        for element in os.listdir("{}/artifacts".format(store)):
+            if element.endswith('.manifest.json'):
+                manifest = read_manifest("{}/artifacts/{}".format(store, element))
+                if manifest['hash'].startswith(artifact.lower()):
+                    candidates.append(manifest)
+
+        if len(candidates) != 1:
+            raise Exception("{} artifacts in store match {}".format(len(candidates), artifact))
+        manifest = candidates[0]
+
+    tree = "{}/trees/{}".format(store, manifest['hash'])
+    if not os.path.isdir(tree):
+        raise Exception("artifact {} is not published in store".format(get_artifact_name(manifest)))
+
+    return manifest, tree
+
+def get_artifact_name(manifest):
+    return "ton-{}-{}".format(manifest.get('commit', 'unknown')[:12], manifest['hash'][:12])
+
+
+if __name__ == '__main__':
+    run()
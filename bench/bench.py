@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+#
+import sys
+import argparse
+import inspect
+import json
+import os
+import pathlib
+import re
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+import setup
+from setup import log
+
+STUB_BINARIES = ['validator-engine', 'validator-engine-console', 'generate-random-id', 'dht-server']
+SCENARIOS = ['node', 'dht', 'node-batch', 'dht-batch']
+
+def run():
+    description = 'Benchmark node / dht provisioning against stub TON binaries and compare with baseline'
+    parser = argparse.ArgumentParser(formatter_class = argparse.RawDescriptionHelpFormatter,
+                                     description = description)
+
+    parser.add_argument('-s', '--scenarios',
+                        required=False,
+                        type=str,
+                        default=",".join(SCENARIOS),
+                        dest='scenarios',
+                        action='store',
+                        help='Comma separated list of scenarios to run - OPTIONAL, defaults to {}'.format(",".join(SCENARIOS)))
+
+    parser.add_argument('-r', '--runs',
+                        required=False,
+                        type=int,
+                        default=3,
+                        dest='runs',
+                        action='store',
+                        help='Number of runs per scenario, median is reported - OPTIONAL, defaults to 3')
+
+    parser.add_argument('-b', '--batch-size',
+                        required=False,
+                        type=int,
+                        default=4,
+                        dest='batch_size',
+                        action='store',
+                        help='Number of instances provisioned concurrently in batch scenarios - OPTIONAL, defaults to 4')
+
+    parser.add_argument('-l', '--latency',
+                        required=False,
+                        type=float,
+                        default=0.2,
+                        dest='latency',
+                        action='store',
+                        help='Latency of every stub binary invocation in seconds, must match baseline - OPTIONAL, defaults to 0.2')
+
+    parser.add_argument('--baseline',
+                        required=False,
+                        type=str,
+                        default='{}/baseline.json'.format(pathlib.Path(__file__).parent),
+                        dest='baseline',
+                        action='store',
+                        help='Baseline file - OPTIONAL, defaults to bench/baseline.json')
+
+    parser.add_argument('--update-baseline',
+                        required=False,
+                        dest='update_baseline',
+                        action='store_true',
+                        help='Store results as new baseline instead of comparing - OPTIONAL')
+
+    parser.add_argument('--forks-only',
+                        required=False,
+                        dest='forks_only',
+                        action='store_true',
+                        help='Store and compare fork counts only, skip timings - OPTIONAL')
+
+    parser.add_argument('--no-baseline',
+                        required=False,
+                        dest='no_baseline',
+                        action='store_true',
+                        help='Only report results, do not compare with baseline - OPTIONAL')
+
+    parser.add_argument('--tolerance',
+                        required=False,
+                        type=float,
+                        default=0.2,
+                        dest='tolerance',
+                        action='store',
+                        help='Allowed relative slowdown against baseline - OPTIONAL, defaults to 0.2')
+
+    parser.add_argument('--slack',
+                        required=False,
+                        type=float,
+                        default=0.25,
+                        dest='slack',
+                        action='store',
+                        help='Allowed absolute slowdown against baseline in seconds - OPTIONAL, defaults to 0.25')
+
+    parser.add_argument('-o', '--output',
+                        required=False,
+                        type=str,
+                        dest='output',
+                        action='store',
+                        help='Write results into json file - OPTIONAL')
+
+    parser.add_argument('--keep',
+                        required=False,
+                        dest='keep',
+                        action='store_true',
+                        help='Keep temporary directories - OPTIONAL')
+
+    parser.add_argument('-v', '--verbosity',
+                        required=False,
+                        type=int,
+                        dest='verbosity',
+                        action='store',
+                        default=2,
+                        help='Verbosity for this script - OPTIONAL')
+
+    args = parser.parse_args()
+    setup.verbosity = args.verbosity
+
+    scenarios = args.scenarios.split(',')
+    for element in scenarios:
+        if element not in SCENARIOS:
+            log(inspect.currentframe().f_code.co_name, 1, "Unknown scenario '{}'".format(element))
+            sys.exit(1)
+
+    baseline = None
+    if not args.update_baseline and not args.no_baseline:
+        if not os.path.isfile(args.baseline):
+            log(inspect.currentframe().f_code.co_name, 1, "Baseline {} does not exist, create it with --update-baseline or specify --no-baseline".format(args.baseline))
+            sys.exit(1)
+
+        with open(args.baseline, 'r') as fh:
+            baseline = json.loads(fh.read())
+
+        # Stub latency dominates timings, they are only comparable with the same latency
+        for scenario in scenarios:
+            if not args.forks_only and scenario in baseline and 'total' in baseline[scenario] \
+                    and baseline[scenario]['latency'] != args.latency:
+                log(inspect.currentframe().f_code.co_name, 1, "Baseline of {} was recorded with stub latency {}, specify -l {} or --forks-only".format(
+                    scenario, baseline[scenario]['latency'], baseline[scenario]['latency']))
+                sys.exit(1)
+
+    results = {}
+    for scenario in scenarios:
+        mode, _, batch = scenario.partition('-')
+        size = args.batch_size if batch else 1
+        runs = []
+        for idx in range(args.runs):
+            log(inspect.currentframe().f_code.co_name, 2, "Running scenario {}, run {} of {}".format(scenario, idx + 1, args.runs))
+            runs.append(bench_run(args, mode, size))
+
+        results[scenario] = summarize(runs)
+        results[scenario]['instances'] = size
+        print_result(scenario, results[scenario])
+
+    if args.output:
+        with open(args.output, 'w') as fh:
+            fh.write(json.dumps(results, indent=4))
+
+    if args.update_baseline:
+        log(inspect.currentframe().f_code.co_name, 2, "Writing baseline {}".format(args.baseline))
+        baseline = {}
+        for scenario, result in results.items():
+            baseline[scenario] = {'instances': result['instances'], 'forks': result['forks']}
+            if not args.forks_only:
+                baseline[scenario]['latency'] = args.latency
+                baseline[scenario]['total'] = round(result['total'], 3)
+                baseline[scenario]['phases'] = {name: round(duration, 3) for name, duration in result['phases'].items()}
+
+        with open(args.baseline, 'w') as fh:
+            fh.write(json.dumps(baseline, indent=4, sort_keys=True))
+    elif args.no_baseline:
+        log(inspect.currentframe().f_code.co_name, 2, "Baseline comparison skipped")
+    else:
+        regressions = compare(args, baseline, results)
+        for element in regressions:
+            log(inspect.currentframe().f_code.co_name, 1, element)
+
+        if regressions:
+            sys.exit(1)
+
+        log(inspect.currentframe().f_code.co_name, 2, "No regressions against baseline")
+
+def bench_run(args, mode, size):
+    workdir = tempfile.mkdtemp(prefix='ton-setup-bench-')
+    try:
+        dist = mk_dist(workdir)
+        global_config = "{}/global.config.json".format(workdir)
+        with open(global_config, 'w') as fh:
+            fh.write(json.dumps({"@type": "config.global", "dht": {}, "liteservers": [], "validator": {}}))
+
+        env = dict(os.environ)
+        env['USER'] = env.get('USER') or setup.pwd.getpwuid(os.getuid()).pw_name
+        env['TON_STUB_COUNTER'] = "{}/forks".format(workdir)
+        env['TON_STUB_LATENCY'] = str(args.latency)
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=size) as executor:
+            instances = list(executor.map(
+                lambda idx: provision(mode, idx, dist, global_config, "{}/instance{}".format(workdir, idx), env),
+                range(size)))
+        total = time.monotonic() - start
+
+        with open(env['TON_STUB_COUNTER'], 'r') as fh:
+            forks = Counter(fh.read().split())
+
+        return {'total': total, 'instances': instances, 'forks': dict(forks)}
+    finally:
+        if args.keep:
+            log(inspect.currentframe().f_code.co_name, 2, "Keeping {}".format(workdir))
+        else:
+            shutil.rmtree(workdir)
+
+def mk_dist(workdir):
+    dist = "{}/dist".format(workdir)
+    os.makedirs("{}/bin".format(dist))
+    stub = "{}/stub.py".format(pathlib.Path(__file__).parent.resolve())
+    for element in STUB_BINARIES:
+        os.symlink(stub, "{}/bin/{}".format(dist, element))
+
+    return dist
+
+def provision(mode, idx, dist, global_config, home, env):
+    # Unbuffered, phases are timed by arrival of each log line
+    process_args = [sys.executable, "-u", "{}/setup.py".format(pathlib.Path(__file__).parent.parent.resolve()),
+                    "-m", mode,
+                    "-I", "bench-{}-{}".format(mode, idx),
+                    "-d", dist,
+                    "-g", global_config,
+                    "-H", home,
+                    "--address", "127.0.0.1",
+                    "--service-threads", "1",
+                    "-v", "3"]
+
+    phases = []
+    output = []
+    start = time.monotonic()
+    process = subprocess.Popen(process_args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env)
+    for line in process.stdout:
+        now = time.monotonic()
+        output.append(line.decode("utf-8").rstrip())
+        match = re.search(r'\[(\w+)\|(\w+)\]: (.*)$', output[-1])
+        if not match:
+            continue
+
+        if phases:
+            phases[-1][1] = now - phases[-1][1]
+        phases.append([normalize_phase(match.group(3)), now])
+
+    process.wait()
+    total = time.monotonic() - start
+    if process.returncode > 0:
+        raise Exception("Provisioning of {} instance {} failed: {}".format(mode, idx, "\n".join(output[-5:])))
+
+    if phases:
+        phases[-1][1] = time.monotonic() - phases[-1][1]
+
+    result = {}
+    for name, duration in phases:
+        result[name] = result.get(name, 0) + duration
+
+    return {'total': total, 'phases': result}
+
+def normalize_phase(message):
+    message = re.sub(r'\S*/\S*', '<path>', message)
+    return re.sub(r'\d+', 'N', message)
+
+def summarize(runs):
+    phases = {}
+    for run in runs:
+        for instance in run['instances']:
+            for name, duration in instance['phases'].items():
+                phases.setdefault(name, []).append(duration)
+
+    return {
+        'total': statistics.median([element['total'] for element in runs]),
+        'instance': statistics.median([instance['total'] for element in runs for instance in element['instances']]),
+        'forks': runs[0]['forks'],
+        'phases': {name: statistics.median(values) for name, values in phases.items()}
+    }
+
+def compare(args, baseline, results):
+    regressions = []
+    for scenario, result in results.items():
+        if scenario not in baseline:
+            regressions.append("Scenario {} is missing in baseline".format(scenario))
+            continue
+
+        if args.forks_only or 'total' not in baseline[scenario]:
+            log(inspect.currentframe().f_code.co_name, 2, "Scenario {} timings not compared".format(scenario))
+        elif result['instances'] != baseline[scenario]['instances']:
+            log(inspect.currentframe().f_code.co_name, 2, "Scenario {} batch size differs from baseline, timings not compared".format(scenario))
+        else:
+            limit = baseline[scenario]['total'] * (1 + args.tolerance) + args.slack
+            if result['total'] > limit:
+                regressions.append("Scenario {} took {:.3f}s, baseline {:.3f}s, limit {:.3f}s".format(
+                    scenario, result['total'], baseline[scenario]['total'], limit))
+
+            for name, duration in baseline[scenario]['phases'].items():
+                limit = duration * (1 + args.tolerance) + args.slack
+                if result['phases'].get(name, 0) > limit:
+                    regressions.append("Scenario {} phase '{}' took {:.3f}s, baseline {:.3f}s, limit {:.3f}s".format(
+                        scenario, name, result['phases'][name], duration, limit))
+
+        # Forks are compared per instance so batch size may differ from baseline
+        for name, count in result['forks'].items():
+            expected = baseline[scenario]['forks'].get(name, 0) / baseline[scenario]['instances']
+            if count / result['instances'] > expected:
+                regressions.append("Scenario {} forked {} {:.1f} times per instance, baseline {:.1f}".format(
+                    scenario, name, count / result['instances'], expected))
+
+    return regressions
+
+def print_result(scenario, result):
+    print("{}: total {:.3f}s, per instance {:.3f}s, forks {}".format(
+        scenario, result['total'], result['instance'],
+        ", ".join(["{} {}".format(name, count) for name, count in sorted(result['forks'].items())])))
+    for name, duration in sorted(result['phases'].items(), key=lambda element: -element[1]):
+        print("    {:>8.3f}s  {}".format(duration, name))
+
+
+if __name__ == '__main__':
+    run()
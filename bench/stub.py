@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+#
+# Stand-in for TON binaries used by bench.py, behaviour is selected by the name
+# it is invoked as (validator-engine, validator-engine-console, generate-random-id
+# or dht-server). Latency is taken from TON_STUB_LATENCY or
+# TON_STUB_LATENCY_<NAME> (seconds), every invocation is appended to
+# TON_STUB_COUNTER file when set.
+#
+import sys
+import argparse
+import base64
+import hashlib
+import json
+import os
+import signal
+import socket, struct
+import time
+
+def run():
+    name = os.path.basename(sys.argv[0])
+    counter = os.environ.get('TON_STUB_COUNTER')
+    if counter:
+        with open(counter, 'a') as fh:
+            fh.write("{}\n".format(name))
+
+    latency = os.environ.get('TON_STUB_LATENCY_{}'.format(name.upper().replace('-', '_')),
+                             os.environ.get('TON_STUB_LATENCY', '0'))
+    time.sleep(float(latency))
+
+    if name == 'generate-random-id':
+        generate_random_id(sys.argv[1:])
+    elif name == 'validator-engine-console':
+        validator_engine_console(sys.argv[1:])
+    elif name in ('validator-engine', 'dht-server'):
+        engine(name, sys.argv[1:])
+    else:
+        sys.stderr.write("Unknown stub {}\n".format(name))
+        sys.exit(1)
+
+def generate_random_id(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-m', '--mode', dest='mode')
+    parser.add_argument('-n', '--name', dest='name')
+    parser.add_argument('-k', '--key', dest='key')
+    parser.add_argument('-a', '--addr-list', dest='addr_list')
+    args = parser.parse_args(argv)
+
+    if args.mode == 'keys':
+        key = mk_key()
+        with open(args.name, 'wb') as fh:
+            fh.write(b'\x17\x23\x68\x49' + key)
+        with open("{}.pub".format(args.name), 'wb') as fh:
+            fh.write(b'\xc6\xb4\x13\x48' + key)
+
+        key_hash = hashlib.sha256(key).digest()
+        print("{} {}".format(key_hash.hex().upper(), base64.b64encode(key_hash).decode()))
+    elif args.mode == 'dht':
+        with open(args.key, 'rb') as fh:
+            key = fh.read()[4:]
+
+        print(json.dumps({
+            "@type": "dht.node",
+            "id": {
+                "@type": "pub.ed25519",
+                "key": base64.b64encode(key).decode()
+            },
+            "addr_list": json.loads(args.addr_list),
+            "version": -1,
+            "signature": base64.b64encode(hashlib.sha512(key + args.addr_list.encode()).digest()).decode()
+        }))
+    else:
+        sys.stderr.write("Unknown mode {}\n".format(args.mode))
+        sys.exit(1)
+
+def validator_engine_console(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-a', '--address', dest='address')
+    parser.add_argument('-k', '--key', dest='key')
+    parser.add_argument('-p', '--pub', dest='pub')
+    parser.add_argument('-v', '--verbosity', dest='verbosity')
+    parser.add_argument('-c', '--cmd', dest='cmd')
+    args = parser.parse_args(argv)
+
+    address, port = args.address.rsplit(':', 1)
+    try:
+        socket.create_connection((address, int(port)), timeout=1).close()
+    except OSError as e:
+        sys.stderr.write("Connection failed: {}\n".format(e))
+        sys.exit(1)
+
+    print("connecting to [{}]".format(args.address))
+    now = int(time.time())
+    if args.cmd == 'gettime':
+        print("received validator time: time={}".format(now))
+    elif args.cmd == 'getstats':
+        print("unixtime\t\t\t{}".format(now))
+        print("masterchainblocktime\t\t\t{}".format(now))
+    else:
+        print("success")
+
+def engine(name, argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-D', '--db', dest='db')
+    parser.add_argument('-C', '--global-config', dest='global_config')
+    parser.add_argument('-I', '--ip', dest='ip')
+    args, unknown = parser.parse_known_args(argv)
+
+    config_file = "{}/config.json".format(args.db)
+    if args.ip:
+        if os.path.isfile(config_file):
+            return
+
+        os.makedirs("{}/keyring".format(args.db), exist_ok=True)
+        key = mk_key()
+        key_hash = hashlib.sha256(key).digest()
+        with open("{}/keyring/{}".format(args.db, key_hash.hex().upper()), 'wb') as fh:
+            fh.write(b'\x17\x23\x68\x49' + key)
+
+        key_id = base64.b64encode(key_hash).decode()
+        config = {
+            "@type": "engine.validator.config",
+            "out_port": 3278,
+            "addrs": [{"@type": "engine.addr",
+                       "ip": struct.unpack('>i', socket.inet_aton(args.ip.rsplit(':', 1)[0]))[0],
+                       "port": int(args.ip.rsplit(':', 1)[1]),
+                       "categories": [0, 1, 2, 3], "priority_categories": []}],
+            "adnl": [{"@type": "engine.adnl", "id": key_id, "category": 0}],
+            "dht": [{"@type": "engine.dht", "id": key_id}],
+            "validators": [],
+            "fullnode": key_id,
+            "liteservers": [],
+            "control": [],
+            "gc": {"@type": "engine.gc", "ids": []}
+        }
+        with open(config_file, 'w') as fh:
+            fh.write(json.dumps(config, indent=4))
+        return
+
+    with open(config_file, 'r') as fh:
+        config = json.loads(fh.read())
+
+    listeners = []
+    for element in config.get('control', []) + config.get('liteservers', []):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind(('127.0.0.1', int(element['port'])))
+        listener.listen(16)
+        listeners.append(listener)
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    while True:
+        time.sleep(1)
+
+def mk_key():
+    return os.urandom(32)
+
+
+if __name__ == '__main__':
+    run()
@@ -5,6 +5,8 @@ INSTALL_PATH='';
 REPOSITORY='https://github.com/ton-blockchain/ton.git';
 BRANCH='master';
 CLEAN_FLAG=false;
+ARTIFACT_PATH='';
+SCRIPT_PATH=$(dirname $(readlink -f "$0"))
 LOG_FILE=$(readlink -f "./ton-build.log")
 BUILD_THREADS=`expr \`cat /proc/cpuinfo | grep processor | wc -l\` - 1`
 BUILD_CONFIG_FLAGS='-DCMAKE_BUILD_TYPE=Release -DTON_USE_JEMALLOC=ON'
@@ -27,6 +29,8 @@ usage() {
     echo '    -b  Branch to checkout';
     echo "        DEFAULT: $BRANCH";
     echo '    -c  Clean: if specified, source path will be removed before work';
+    echo '    -a  Artifact path: if specified, install tree will be packaged into';
+    echo '        versioned artifact (tar.zst + manifest) in this path, must be absolute!';
     echo '    -h  Show usage';
     echo 'Notes:';
     echo '    If source path already exists and clean flag is not set, this script will not';
@@ -77,7 +81,7 @@ print_title()
 }
 
 
-while getopts ":s:i:r:b:ch" o; do
+while getopts ":s:i:r:b:a:ch" o; do
     case "${o}" in
         s)
             SRC_PATH=${OPTARG}
@@ -95,6 +99,9 @@ while getopts ":s:i:r:b:ch" o; do
         c)
             CLEAN_FLAG=true
             ;;
+        a)
+            ARTIFACT_PATH=${OPTARG}
+            ;;
         *)
             usage
             ;;
@@ -111,6 +118,11 @@ fi
 
 check_path_absolute $SRC_PATH
 check_path_absolute $INSTALL_PATH
+if [ ! -z ${ARTIFACT_PATH} ];
+then
+    ARTIFACT_PATH=$(clean_path $ARTIFACT_PATH)
+    check_path_absolute $ARTIFACT_PATH
+fi
 
 echo "Output of all commands can be found in file $LOG_FILE";
 echo "" >$LOG_FILE
@@ -167,4 +179,12 @@ check_errs $? "Install failed, check logs"
 cp dht/dht-ping-servers $INSTALL_PATH/bin
 cp dht/dht-resolve $INSTALL_PATH/bin
 
+if [ ! -z ${ARTIFACT_PATH} ];
+then
+    print_title "Packaging artifact into $ARTIFACT_PATH.";
+    cd $SRC_PATH
+    python3 $SCRIPT_PATH/artifact.py -m pack -i $INSTALL_PATH -o $ARTIFACT_PATH --commit $(git rev-parse HEAD) --build-flags="$BUILD_CONFIG_FLAGS" 2>&1 | tee -a $LOG_FILE
+    check_errs ${PIPESTATUS[0]} "Packaging failed, check logs"
+fi
+
 print_line "Mission acomplished!"
\ No newline at end of file
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+#
+import sys
+import argparse
+import contextlib
+import hashlib
+import inspect
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+import setup
+from setup import log, mk_path, find_instance_configs, mk_dht_address_list, get_dht_key_file, get_server_address, sign_dht_record
+
+def run():
+    description = 'Sign DHT records of all dht server instances in bulk and build static DHT node list'
+    parser = argparse.ArgumentParser(formatter_class = argparse.RawDescriptionHelpFormatter,
+                                     description = description)
+
+    parser.add_argument('instances',
+                        nargs='+',
+                        type=str,
+                        help='Instance configuration files or directories to search for instance.config.json - REQUIRED')
+
+    parser.add_argument('-o', '--output',
+                        required=False,
+                        type=str,
+                        dest='output',
+                        action='store',
+                        help='Write merged dht section for global config into file - OPTIONAL')
+
+    parser.add_argument('--write-snips',
+                        required=False,
+                        dest='write_snips',
+                        action='store_true',
+                        help='Update snippet and local config files of instances with new records - OPTIONAL')
+
+    parser.add_argument('--cache-file',
+                        required=False,
+                        type=str,
+                        default='{}/.ton-setup/dht-sign.cache.json'.format(os.path.expanduser('~')),
+                        dest='cache_file',
+                        action='store',
+                        help='Signature cache file - OPTIONAL, defaults to $HOME/.ton-setup/dht-sign.cache.json')
+
+    parser.add_argument('--threads',
+                        required=False,
+                        type=int,
+                        default=os.cpu_count(),
+                        dest='threads',
+                        action='store',
+                        help='Number of parallel signing processes - OPTIONAL, defaults to number of cores')
+
+    parser.add_argument('-k', '--dht-k',
+                        required=False,
+                        type=int,
+                        default=6,
+                        dest='dht_k',
+                        action='store',
+                        help='DHT k parameter of generated config - OPTIONAL, defaults to 6')
+
+    parser.add_argument('-a', '--dht-a',
+                        required=False,
+                        type=int,
+                        default=3,
+                        dest='dht_a',
+                        action='store',
+                        help='DHT a parameter of generated config - OPTIONAL, defaults to 3')
+
+    parser.add_argument('-v', '--verbosity',
+                        required=False,
+                        type=int,
+                        dest='verbosity',
+                        action='store',
+                        default=3,
+                        help='Verbosity for this script - OPTIONAL')
+
+    args = parser.parse_args()
+    setup.verbosity = args.verbosity
+
+    if args.output:
+        dht_config = mk_dht_config(args)
+        log(inspect.currentframe().f_code.co_name, 3, "Writing dht config with {} nodes into {}".format(
+            len(dht_config['static_nodes']['nodes']), args.output))
+        with open(args.output, 'w') as fh:
+            fh.write(json.dumps(dht_config, indent=4))
+    else:
+        # Config is written to stdout, keep log messages out of it
+        with contextlib.redirect_stdout(sys.stderr):
+            dht_config = mk_dht_config(args)
+        print(json.dumps(dht_config, indent=4))
+
+def mk_dht_config(args):
+    log(inspect.currentframe().f_code.co_name, 3, "Collecting instances")
+    instances = []
+    for element in find_instance_configs(args.instances):
+        with open(element, 'r') as fh:
+            instance_data = json.loads(fh.read())
+
+        if instance_data['mode'] != 'dht':
+            log(inspect.currentframe().f_code.co_name, 3, "Skipping {} instance {}".format(instance_data['mode'], instance_data['name']))
+            continue
+
+        instances.append(instance_data)
+
+    if not instances:
+        log(inspect.currentframe().f_code.co_name, 1, "No dht instances found")
+        sys.exit(1)
+
+    cache = {}
+    if os.path.isfile(args.cache_file):
+        with open(args.cache_file, 'r') as fh:
+            cache = json.loads(fh.read())
+
+    log(inspect.currentframe().f_code.co_name, 3, "Preparing records of {} instances".format(len(instances)))
+    jobs = []
+    for instance_data in instances:
+        # Server config holds address and port dht-server actually binds to
+        address = get_server_address(instance_data['paths']['db'])
+        if not address:
+            log(inspect.currentframe().f_code.co_name, 1, "No address found in server configuration of {}".format(instance_data['name']))
+            sys.exit(1)
+
+        address_list = mk_dht_address_list(address[0], address[1])
+        key_file = get_dht_key_file(instance_data['paths']['db'])
+        jobs.append([instance_data, key_file, address_list, get_record_hash(key_file, address_list)])
+
+    pending = [element for element in jobs if element[3] not in cache]
+    log(inspect.currentframe().f_code.co_name, 3, "Signing {} records, {} unchanged".format(len(pending), len(jobs) - len(pending)))
+    with ThreadPoolExecutor(max_workers=max(args.threads, 1)) as executor:
+        futures = [[element, executor.submit(sign_dht_record,
+                                             element[0]['binaries']['generate_random_id'],
+                                             element[1],
+                                             element[2])] for element in pending]
+        for element, future in futures:
+            try:
+                cache[element[3]] = future.result()
+            except Exception as e:
+                log(inspect.currentframe().f_code.co_name, 1, "Record signature of {} failed: {}".format(element[0]['name'], e))
+                sys.exit(1)
+
+    mk_path(os.path.dirname(args.cache_file))
+    with open(args.cache_file, 'w') as fh:
+        fh.write(json.dumps(cache, indent=4))
+
+    nodes = [cache[element[3]] for element in jobs]
+    if args.write_snips:
+        for instance_data, key_file, address_list, record_hash in jobs:
+            log(inspect.currentframe().f_code.co_name, 3, "Writing snippet and local config of {}".format(instance_data['name']))
+            with open(instance_data['configs']['snip'], 'w') as fh:
+                fh.write(json.dumps(cache[record_hash], indent=4))
+
+            with open(instance_data['configs']['global'], 'r') as fh:
+                local_config = json.loads(fh.read())
+                local_config['dht'] = [cache[record_hash]]
+
+                with open(instance_data['configs']['local'], 'w') as fw:
+                    fw.write(json.dumps(local_config, indent=4))
+
+    return {
+        "@type": "dht.config.global",
+        "k": args.dht_k,
+        "a": args.dht_a,
+        "static_nodes": {
+            "@type": "dht.nodes",
+            "nodes": nodes
+        }
+    }
+
+def get_record_hash(key_file, address_list):
+    with open(key_file, 'rb') as fh:
+        key_hash = hashlib.sha256(fh.read()).hexdigest()
+
+    return hashlib.sha256("{}:{}".format(key_hash, json.dumps(address_list, sort_keys=True)).encode()).hexdigest()
+
+
+if __name__ == '__main__':
+    run()
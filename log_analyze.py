@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+#
+import sys
+import argparse
+import bz2
+import calendar
+import contextlib
+import gzip
+import inspect
+import json
+import lzma
+import mmap
+import os
+import re
+import time
+from multiprocessing import Pool
+import setup
+from setup import log, mk_path
+
+COMPRESSED = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open, '.lzma': lzma.open}
+COUNTERS = ['lines', 'errors', 'warnings', 'slow', 'sync', 'session']
+LINE_RE = re.compile(rb'^\[\s*(\d+)\]\[t\s*\d+\]\[(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)')
+SESSION_RE = re.compile(rb'"timestamp"\s*:\s*"?(\d+(?:\.\d+)?)')
+SLOW_RE = re.compile(rb'(?i)\bslow\b')
+DURATION_RE = re.compile(rb'(?i)\b(?:took|duration|time)[=:\s]+(\d+(?:\.\d+)?)\s*(ms|s)\b')
+SYNC_RE = rb'(?i)new masterchain block|\bsync(?:ed|ing|hronized)?\b|\bdownload(?:ed|ing)? (?:block|state|archive)'
+
+def run():
+    description = 'Summarize errors, slow operations and sync events of node and session logs per time bucket'
+    parser = argparse.ArgumentParser(formatter_class = argparse.RawDescriptionHelpFormatter,
+                                     description = description)
+
+    parser.add_argument('files',
+                        nargs='+',
+                        type=str,
+                        help='Log files, plain or compressed with gzip, bzip2 or xz - REQUIRED')
+
+    parser.add_argument('-b', '--bucket',
+                        required=False,
+                        type=int,
+                        default=3600,
+                        dest='bucket',
+                        action='store',
+                        help='Time bucket size in seconds - OPTIONAL, defaults to 3600')
+
+    parser.add_argument('--slow-threshold',
+                        required=False,
+                        type=float,
+                        default=1.0,
+                        dest='slow_threshold',
+                        action='store',
+                        help='Operation duration in seconds from which it is counted as slow - OPTIONAL, defaults to 1.0')
+
+    parser.add_argument('--sync-pattern',
+                        required=False,
+                        type=str,
+                        default=SYNC_RE.decode(),
+                        dest='sync_pattern',
+                        action='store',
+                        help='Regular expression matching sync events - OPTIONAL')
+
+    parser.add_argument('--workers',
+                        required=False,
+                        type=int,
+                        default=os.cpu_count(),
+                        dest='workers',
+                        action='store',
+                        help='Number of parser processes - OPTIONAL, defaults to number of cores')
+
+    parser.add_argument('--chunk-size',
+                        required=False,
+                        type=int,
+                        default=64,
+                        dest='chunk_size',
+                        action='store',
+                        help='Size of chunks handed to parser processes in MB - OPTIONAL, defaults to 64')
+
+    parser.add_argument('--index-file',
+                        required=False,
+                        type=str,
+                        default='{}/.ton-setup/log-index.json'.format(os.path.expanduser('~')),
+                        dest='index_file',
+                        action='store',
+                        help='Index of already parsed data - OPTIONAL, defaults to $HOME/.ton-setup/log-index.json')
+
+    parser.add_argument('--no-index',
+                        required=False,
+                        dest='no_index',
+                        action='store_true',
+                        help='Ignore and do not update index, parse everything - OPTIONAL')
+
+    parser.add_argument('--json',
+                        required=False,
+                        dest='json',
+                        action='store_true',
+                        help='Output summary as json - OPTIONAL')
+
+    parser.add_argument('-v', '--verbosity',
+                        required=False,
+                        type=int,
+                        dest='verbosity',
+                        action='store',
+                        default=2,
+                        help='Verbosity for this script - OPTIONAL')
+
+    args = parser.parse_args()
+    setup.verbosity = args.verbosity
+
+    if args.json:
+        # Summary is written to stdout, keep log messages out of it
+        with contextlib.redirect_stdout(sys.stderr):
+            summary = analyze(args)
+        print(json.dumps(summary, indent=4, sort_keys=True))
+        return
+
+    summary = analyze(args)
+    print("{:<20} {:>10} {:>8} {:>8} {:>8} {:>6} {:>6} {:>8}".format(
+        'bucket (UTC)', 'lines', 'errors', 'err %', 'warnings', 'slow', 'sync', 'session'))
+    for bucket in sorted(summary, key=int):
+        element = summary[bucket]
+        print("{:<20} {:>10} {:>8} {:>8.3f} {:>8} {:>6} {:>6} {:>8}".format(
+            time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(int(bucket))),
+            element['lines'], element['errors'],
+            element['errors'] * 100 / element['lines'] if element['lines'] else 0,
+            element['warnings'], element['slow'], element['sync'], element['session']))
+
+def analyze(args):
+    index = {}
+    if not args.no_index and os.path.isfile(args.index_file):
+        with open(args.index_file, 'r') as fh:
+            index = json.loads(fh.read())
+
+    config = [args.bucket, args.slow_threshold, args.sync_pattern.encode()]
+    index_key = "{}:{}:{}".format(*config)
+    summary = {}
+    paths = []
+    for path in args.files:
+        path = os.path.realpath(path)
+        if not os.path.isfile(path):
+            log(inspect.currentframe().f_code.co_name, 1, "Log file {} does not exist".format(path))
+            sys.exit(1)
+        paths.append(path)
+
+    with Pool(processes=max(args.workers, 1)) as pool:
+        # Compressed files are parsed whole by single workers, submit all of them before plain files are chunked
+        pending = []
+        for path in paths:
+            entry = index.get(path)
+            if not entry or entry['config'] != index_key:
+                entry = None
+
+            if os.path.splitext(path)[1] in COMPRESSED:
+                pending.append([path, scan_compressed(pool, path, entry, config)])
+            else:
+                index[path] = scan_plain(pool, path, entry, config, args.chunk_size * 1024 * 1024)
+
+        for path, entry in pending:
+            if not isinstance(entry['buckets'], dict):
+                entry['buckets'] = entry['buckets'].get()
+            index[path] = entry
+
+        for path in paths:
+            index[path]['config'] = index_key
+            merge(summary, index[path]['buckets'])
+
+    if not args.no_index:
+        mk_path(os.path.dirname(args.index_file))
+        with open(args.index_file, 'w') as fh:
+            fh.write(json.dumps(index))
+
+    return summary
+
+def scan_plain(pool, path, entry, config, chunk_size):
+    stat = os.stat(path)
+    if not entry or entry['inode'] != stat.st_ino or entry['offset'] > stat.st_size:
+        if entry:
+            log(inspect.currentframe().f_code.co_name, 2, "Log file {} was rotated or truncated, parsing from start".format(path))
+        entry = {'inode': stat.st_ino, 'offset': 0, 'buckets': {}}
+
+    if stat.st_size == entry['offset']:
+        log(inspect.currentframe().f_code.co_name, 3, "Log file {} has no new data".format(path))
+        return entry
+
+    chunks = []
+    with open(path, 'rb') as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        end = mm.rfind(b'\n', entry['offset']) + 1
+        start = entry['offset']
+        while start < end:
+            stop = min(start + chunk_size, end)
+            if stop < end:
+                stop = mm.find(b'\n', stop - 1) + 1
+            chunks.append([path, start, stop, config])
+            start = stop
+
+    log(inspect.currentframe().f_code.co_name, 3, "Parsing {} bytes of {} in {} chunks".format(
+        sum([element[2] - element[1] for element in chunks]), path, len(chunks)))
+    for buckets in pool.imap_unordered(parse_chunk, chunks):
+        merge(entry['buckets'], buckets)
+
+    if chunks:
+        entry['offset'] = chunks[-1][2]
+
+    return entry
+
+def scan_compressed(pool, path, entry, config):
+    stat = os.stat(path)
+    if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+        log(inspect.currentframe().f_code.co_name, 3, "Compressed log file {} already parsed".format(path))
+        return entry
+
+    log(inspect.currentframe().f_code.co_name, 3, "Parsing compressed log file {}".format(path))
+    return {
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'buckets': pool.apply_async(parse_compressed, [path, config])
+    }
+
+def parse_chunk(job):
+    path, start, stop, config = job
+    with open(path, 'rb') as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return parse_lines(mm[start:stop].splitlines(), config)
+
+def parse_compressed(path, config):
+    with COMPRESSED[os.path.splitext(path)[1]](path, 'rb') as fh:
+        return parse_lines(fh, config)
+
+def parse_lines(lines, config):
+    bucket_size, slow_threshold, sync_pattern = config
+    sync_re = re.compile(sync_pattern)
+    stamps = {}
+    buckets = {}
+    for line in lines:
+        match = LINE_RE.match(line)
+        if match:
+            level = int(match.group(1))
+            stamp = match.group(2)
+            if stamp not in stamps:
+                stamps[stamp] = calendar.timegm(time.strptime(stamp.decode(), "%Y-%m-%d %H:%M:%S"))
+            timestamp = stamps[stamp]
+        elif line.startswith(b'{'):
+            match = SESSION_RE.search(line)
+            if not match:
+                continue
+            level = None
+            timestamp = int(float(match.group(1)))
+        else:
+            continue
+
+        bucket = str(timestamp - timestamp % bucket_size)
+        if bucket not in buckets:
+            buckets[bucket] = dict.fromkeys(COUNTERS, 0)
+        element = buckets[bucket]
+
+        element['lines'] += 1
+        if level is None:
+            element['session'] += 1
+            continue
+        elif level <= 1:
+            element['errors'] += 1
+        elif level == 2:
+            element['warnings'] += 1
+
+        if SLOW_RE.search(line) or is_slow(line, slow_threshold):
+            element['slow'] += 1
+        if sync_re.search(line):
+            element['sync'] += 1
+
+    return buckets
+
+def is_slow(line, threshold):
+    match = DURATION_RE.search(line)
+    if not match:
+        return False
+
+    duration = float(match.group(1))
+    if match.group(2).lower() == b'ms':
+        duration = duration / 1000
+
+    return duration >= threshold
+
+def merge(target, source):
+    for bucket, counters in source.items():
+        if bucket not in target:
+            target[bucket] = dict.fromkeys(COUNTERS, 0)
+        for name, value in counters.items():
+            target[bucket][name] += value
+
+
+if __name__ == '__main__':
+    run()
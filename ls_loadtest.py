@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+#
+import sys
+import argparse
+import asyncio
+import inspect
+import json
+import random
+import socket, struct
+import time
+import setup
+from setup import log
+
+def run():
+    description = 'Load test liteserver endpoints of node with client side load balancing'
+    parser = argparse.ArgumentParser(formatter_class = argparse.RawDescriptionHelpFormatter,
+                                     description = description)
+
+    parser.add_argument('-c', '--config',
+                        required=False,
+                        type=str,
+                        dest='config',
+                        action='store',
+                        help='Local config file (local.config.json) to take liteserver endpoints from - OPTIONAL')
+
+    parser.add_argument('--stubs',
+                        required=False,
+                        type=int,
+                        default=0,
+                        dest='stubs',
+                        action='store',
+                        help='Number of local stub liteservers to start on random ports when no config is specified - OPTIONAL')
+
+    parser.add_argument('--stub-latency',
+                        required=False,
+                        type=float,
+                        default=0.005,
+                        dest='stub_latency',
+                        action='store',
+                        help='Processing delay of stub liteservers in seconds - OPTIONAL, defaults to 0.005')
+
+    parser.add_argument('--no-stubs',
+                        required=False,
+                        dest='no_stubs',
+                        action='store_true',
+                        help='Do not start stub liteservers on configured endpoints, implies --connect-only - OPTIONAL')
+
+    parser.add_argument('--connect-only',
+                        required=False,
+                        dest='connect_only',
+                        action='store_true',
+                        help='Open new connection for every request and measure TCP connection setup only, usable against real liteservers - OPTIONAL')
+
+    parser.add_argument('--connections',
+                        required=False,
+                        type=int,
+                        default=32,
+                        dest='connections',
+                        action='store',
+                        help='Number of concurrent clients, each keeping one persistent connection - OPTIONAL, defaults to 32')
+
+    parser.add_argument('--requests',
+                        required=False,
+                        type=int,
+                        default=100,
+                        dest='requests',
+                        action='store',
+                        help='Number of requests per client connection - OPTIONAL, defaults to 100')
+
+    parser.add_argument('--balance',
+                        required=False,
+                        type=str,
+                        default='random',
+                        dest='balance',
+                        action='store',
+                        help='[random|round-robin] endpoint selection of clients - OPTIONAL, defaults to random')
+
+    parser.add_argument('--payload',
+                        required=False,
+                        type=int,
+                        default=64,
+                        dest='payload',
+                        action='store',
+                        help='Request payload size in bytes - OPTIONAL, defaults to 64')
+
+    parser.add_argument('-v', '--verbosity',
+                        required=False,
+                        type=int,
+                        dest='verbosity',
+                        action='store',
+                        default=3,
+                        help='Verbosity for this script - OPTIONAL')
+
+    args = parser.parse_args()
+    setup.verbosity = args.verbosity
+
+    if args.balance not in ('random', 'round-robin'):
+        log(inspect.currentframe().f_code.co_name, 1, "Unknown balance mode '{}'".format(args.balance))
+        sys.exit(1)
+    elif not args.config and args.stubs < 1:
+        log(inspect.currentframe().f_code.co_name, 1, "Either config or number of stubs must be specified")
+        sys.exit(1)
+
+    endpoints = []
+    if args.config:
+        log(inspect.currentframe().f_code.co_name, 3, "Reading liteserver endpoints from {}".format(args.config))
+        with open(args.config, 'r') as fh:
+            for element in json.loads(fh.read())['liteservers']:
+                endpoints.append([socket.inet_ntoa(struct.pack('>i', element['ip'])), int(element['port'])])
+
+    if args.no_stubs:
+        args.connect_only = True
+
+    results = asyncio.run(load_test(args, endpoints))
+
+    print("{:<24} {:>9} {:>7} {:>10} {:>10} {:>10} {:>10}".format(
+        'endpoint', 'requests', 'errors', 'p50 ms', 'p95 ms', 'p99 ms', 'req/s'))
+    for element in results:
+        print("{:<24} {:>9} {:>7} {:>10.2f} {:>10.2f} {:>10.2f} {:>10.1f}".format(
+            element['endpoint'], element['requests'], element['errors'],
+            element['p50'] * 1000, element['p95'] * 1000, element['p99'] * 1000,
+            element['throughput']))
+
+async def load_test(args, endpoints):
+    servers = []
+    if not args.no_stubs:
+        try:
+            if endpoints:
+                log(inspect.currentframe().f_code.co_name, 3, "Starting {} stub liteservers on configured ports".format(len(endpoints)))
+                for element in endpoints:
+                    servers.append(await start_stub('127.0.0.1', element[1], args.stub_latency))
+                    element[0] = '127.0.0.1'
+            else:
+                log(inspect.currentframe().f_code.co_name, 3, "Starting {} stub liteservers".format(args.stubs))
+                for idx in range(args.stubs):
+                    server = await start_stub('127.0.0.1', 0, args.stub_latency)
+                    servers.append(server)
+                    endpoints.append(['127.0.0.1', server.sockets[0].getsockname()[1]])
+        except OSError as e:
+            log(inspect.currentframe().f_code.co_name, 1, "Could not start stub liteserver: {}, use --no-stubs to test running liteservers".format(e))
+            for server in servers:
+                server.close()
+                await server.wait_closed()
+            sys.exit(1)
+
+    stats = {"{}:{}".format(*element): [] for element in endpoints}
+    errors = {"{}:{}".format(*element): 0 for element in endpoints}
+    log(inspect.currentframe().f_code.co_name, 3, "Running {} clients x {} requests against {} endpoints".format(
+        args.connections, args.requests, len(endpoints)))
+
+    start = time.monotonic()
+    await asyncio.gather(*[client(idx, args, endpoints, stats, errors) for idx in range(args.connections)])
+    elapsed = time.monotonic() - start
+
+    for server in servers:
+        server.close()
+        await server.wait_closed()
+
+    results = []
+    for endpoint in stats:
+        latencies = sorted(stats[endpoint])
+        results.append({
+            'endpoint': endpoint,
+            'requests': len(latencies),
+            'errors': errors[endpoint],
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'throughput': len(latencies) / elapsed if elapsed else 0
+        })
+
+    return results
+
+async def client(idx, args, endpoints, stats, errors):
+    # Lite clients keep their connection open, endpoint is picked on every (re)connect
+    payload = bytes(args.payload)
+    connects = 0
+    connection = None
+    for request in range(args.requests):
+        if not connection:
+            if args.balance == 'random':
+                endpoint = random.choice(endpoints)
+            else:
+                endpoint = endpoints[(idx + connects) % len(endpoints)]
+            name = "{}:{}".format(*endpoint)
+            connects += 1
+
+        start = time.monotonic()
+        try:
+            if not connection:
+                connection = await asyncio.open_connection(endpoint[0], endpoint[1])
+
+            reader, writer = connection
+            if args.connect_only:
+                connection = None
+                writer.close()
+                await writer.wait_closed()
+            else:
+                writer.write(struct.pack('<I', len(payload)) + payload)
+                await writer.drain()
+                size = struct.unpack('<I', await reader.readexactly(4))[0]
+                await reader.readexactly(size)
+
+            stats[name].append(time.monotonic() - start)
+        except (OSError, asyncio.IncompleteReadError):
+            errors[name] += 1
+            if connection:
+                connection[1].close()
+                connection = None
+
+    if connection:
+        connection[1].close()
+        await connection[1].wait_closed()
+
+async def start_stub(address, port, latency):
+    async def handle(reader, writer):
+        try:
+            while True:
+                size = struct.unpack('<I', await reader.readexactly(4))[0]
+                data = await reader.readexactly(size)
+                await asyncio.sleep(latency)
+                writer.write(struct.pack('<I', len(data)) + data)
+                await writer.drain()
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, address, port)
+
+def percentile(values, rank):
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(len(values) * rank / 100))]
+
+
+if __name__ == '__main__':
+    run()
@@ -16,6 +16,15 @@ import requests
 import random
 import json
 import pathlib
+import hashlib
+import fcntl
+import psutil
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+
+FICLONE = 0x40049409
+CLONE_SKIP = ['config.json', 'config.json.tmp', 'keyring']
+DIST_MANIFEST = '.ton-artifact.manifest.json'
 
 verbosity = None
 def run():
@@ -45,6 +54,13 @@ def run():
                         action='store',
                         help='TON Distribution home / basepath (path which was specified during cmake install step) - REQUIRED')
 
+    parser.add_argument('--dist-hash',
+                        required=False,
+                        type=str,
+                        dest='dist_hash',
+                        action='store',
+                        help='Expected artifact hash (or its prefix of at least 12 characters) of TON Distribution, verified against installed files - OPTIONAL')
+
     parser.add_argument('-g', '--global-config',
                         required=True,
                         type=str,
@@ -94,6 +110,33 @@ def run():
                         action='store',
                         help='URL to node database dump in tar(!) format compressed with lzip - OPTIONAL')
 
+    parser.add_argument('--clone-from',
+                        required=False,
+                        type=str,
+                        dest='clone_from',
+                        action='store',
+                        help='Instance configuration file (instance.config.json) of local node to clone database from, node mode only - OPTIONAL')
+
+    parser.add_argument('--clone-pause',
+                        required=False,
+                        dest='clone_pause',
+                        action='store_true',
+                        help='Suspend running source node while its database is copied instead of refusing to clone - OPTIONAL')
+
+    parser.add_argument('--clone-hardlink',
+                        required=False,
+                        dest='clone_hardlink',
+                        action='store_true',
+                        help='Hardlink immutable database files (*.sst) instead of copying them, source and clone must share filesystem and owner - OPTIONAL')
+
+    parser.add_argument('--clone-threads',
+                        required=False,
+                        type=int,
+                        default=os.cpu_count(),
+                        dest='clone_threads',
+                        action='store',
+                        help='Number of parallel file copy threads used by clone - OPTIONAL, defaults to number of cores')
+
     parser.add_argument('--address',
                         required=False,
                         type=str,
@@ -113,7 +156,15 @@ def run():
                         type=str,
                         dest='ls_port',
                         action='store',
-                        help='Liteserver port - OPTIONAL')
+                        help='Liteserver port, with --ls-count above 1 following liteservers use consecutive ports - OPTIONAL')
+
+    parser.add_argument('--ls-count',
+                        required=False,
+                        type=int,
+                        default=1,
+                        dest='ls_count',
+                        action='store',
+                        help='Number of liteservers (identities and ports) to configure on node - OPTIONAL, defaults to 1')
 
     parser.add_argument('--console-port',
                         required=False,
@@ -239,6 +290,22 @@ def run():
     elif args.mode not in ('node', 'dht'):
         log(inspect.currentframe().f_code.co_name, 1, "Unknown mode '{}'".format(args.mode))
         sys.exit(1)
+    elif args.ls_count < 1:
+        log(inspect.currentframe().f_code.co_name, 1, "Liteserver count must be at least 1")
+        sys.exit(1)
+    elif args.clone_from and args.mode != 'node':
+        log(inspect.currentframe().f_code.co_name, 1, "Clone is supported in node mode only")
+        sys.exit(1)
+    elif args.clone_from and not os.path.isfile(args.clone_from):
+        log(inspect.currentframe().f_code.co_name, 1, "Source instance configuration {} does not exist".format(args.clone_from))
+        sys.exit(1)
+
+    if args.dist_hash:
+        log(inspect.currentframe().f_code.co_name, 3, "Verifying distribution {}".format(args.dist_home))
+        reason = check_dist_hash(args.dist_home, args.dist_hash)
+        if reason:
+            log(inspect.currentframe().f_code.co_name, 1, "Distribution {} verification failed: {}".format(args.dist_home, reason))
+            sys.exit(1)
 
     log(inspect.currentframe().f_code.co_name, 3, "Populating instance data")
     instance_data = {
@@ -248,6 +315,7 @@ def run():
             'address': None,
             'service_port': None,
             'ls_port': None,
+            'ls_ports': [],
             'console_port': None
         },
         'paths': {
@@ -347,16 +415,31 @@ def run():
 
 
     used_ports = []
+    if args.service_port:
+        used_ports.append(int(args.service_port))
+    if args.mode == 'node' and args.ls_port:
+        used_ports += [int(args.ls_port) + idx for idx in range(args.ls_count)]
+    if args.mode == 'node' and args.console_port:
+        used_ports.append(int(args.console_port))
+
+    if len(used_ports) != len(set(used_ports)):
+        log(inspect.currentframe().f_code.co_name, 1, "Service, liteserver and console ports overlap: {}".format(
+            ", ".join([str(element) for element in used_ports])))
+        sys.exit(1)
+
     if args.service_port:
         instance_data['network']['service_port'] = args.service_port
     else:
         instance_data['network']['service_port'] = get_unused_port(used_ports)
 
     if args.mode == 'node':
-        if args.ls_port:
-            instance_data['network']['ls_port'] = args.ls_port
-        else:
-            instance_data['network']['ls_port'] = get_unused_port(used_ports)
+        for idx in range(args.ls_count):
+            if args.ls_port:
+                instance_data['network']['ls_ports'].append(int(args.ls_port) + idx)
+            else:
+                instance_data['network']['ls_ports'].append(get_unused_port(used_ports))
+
+        instance_data['network']['ls_port'] = instance_data['network']['ls_ports'][0]
 
         if args.console_port:
             instance_data['network']['console_port'] = args.console_port
@@ -369,6 +452,7 @@ def run():
     instance_data['configs']['global'] = "{}/global.config.json".format(instance_data['paths']['etc'])
     instance_data['configs']['local'] = "{}/local.config.json".format(instance_data['paths']['etc'])
     instance_data['configs']['snip'] = "{}/snip.config.json".format(instance_data['paths']['etc'])
+    instance_data['configs']['snips'] = "{}/liteservers.config.json".format(instance_data['paths']['etc'])
     instance_data['configs']['instance'] = "{}/instance.config.json".format(instance_data['paths']['etc'])
     instance_data['configs']['node'] = "{}/config.json".format(instance_data['paths']['db'])
 
@@ -414,6 +498,63 @@ def run():
         log(inspect.currentframe().f_code.co_name, 1, "Specified global config {} cannot be found".format(args.global_config))
         sys.exit(1)
 
+    if args.clone_from:
+        log(inspect.currentframe().f_code.co_name, 3, "Reading source instance configuration {}".format(args.clone_from))
+        with open(args.clone_from, 'r') as fh:
+            source_instance = json.loads(fh.read())
+
+        if source_instance['mode'] != 'node':
+            log(inspect.currentframe().f_code.co_name, 1, "Source instance {} is not a node".format(source_instance['name']))
+            sys.exit(1)
+        elif os.path.realpath(source_instance['paths']['db']) == os.path.realpath(instance_data['paths']['db']):
+            log(inspect.currentframe().f_code.co_name, 1, "Source and target database paths are identical")
+            sys.exit(1)
+        elif args.clone_hardlink and source_instance['users']['service']['uid'] != instance_data['users']['service']['uid']:
+            # Hardlinked files share inodes, chown of clone database would change owner of source files
+            log(inspect.currentframe().f_code.co_name, 1, "Source service user {} differs from target service user {}, --clone-hardlink cannot be used".format(
+                source_instance['users']['service']['user'], instance_data['users']['service']['user']))
+            sys.exit(1)
+
+        processes = find_db_processes(source_instance['paths']['db'])
+        if processes and not args.clone_pause:
+            log(inspect.currentframe().f_code.co_name, 1, "Source node is running (pid {}), stop it or specify --clone-pause flag".format(
+                ", ".join([str(element.pid) for element in processes])))
+            sys.exit(1)
+
+        suspended = []
+        try:
+            for element in processes:
+                log(inspect.currentframe().f_code.co_name, 3, "Suspending source node process {}".format(element.pid))
+                element.suspend()
+                suspended.append(element)
+
+            log(inspect.currentframe().f_code.co_name, 3, "Cloning database {} into {}".format(source_instance['paths']['db'], instance_data['paths']['db']))
+            start = time.time()
+            result = clone_db(source_path=source_instance['paths']['db'],
+                              target_path=instance_data['paths']['db'],
+                              threads=args.clone_threads,
+                              hardlink=args.clone_hardlink)
+            log(inspect.currentframe().f_code.co_name, 3, "Cloned {} files, {} bytes in {:.1f} seconds ({})".format(
+                len(result),
+                sum([element[1] for element in result]),
+                time.time() - start,
+                ", ".join(["{}: {}".format(method, count) for method, count in Counter([element[0] for element in result]).items()])))
+        except Exception as e:
+            result = None
+            log(inspect.currentframe().f_code.co_name, 1, "Database clone failed: {}".format(e))
+        finally:
+            for element in suspended:
+                log(inspect.currentframe().f_code.co_name, 3, "Resuming source node process {}".format(element.pid))
+                try:
+                    element.resume()
+                except psutil.Error as e:
+                    log(inspect.currentframe().f_code.co_name, 1, "Could not resume source node process {}: {}".format(element.pid, e))
+
+        if result is None:
+            log(inspect.currentframe().f_code.co_name, 3, "Removing partially cloned database {}".format(instance_data['paths']['db']))
+            shutil.rmtree(instance_data['paths']['db'], ignore_errors=True)
+            sys.exit(1)
+
     log(inspect.currentframe().f_code.co_name, 3, "Initializing database in {}".format(instance_data['paths']['db']))
     log_file = "{}/init".format(instance_data['paths']['init_log'])
     process_args = [instance_data['binaries']['process'],
@@ -443,23 +584,34 @@ def run():
             log(inspect.currentframe().f_code.co_name, 1, "Could not read node configuration")
             sys.exit(1)
 
-        log(inspect.currentframe().f_code.co_name, 3, "Generating console server, client and liteserver keys")
-        instance_data['keys']['server'] = mk_keys("{}/keys/server".format(instance_data['paths']['etc']), instance_data['paths']['dist'])
-        instance_data['keys']['client'] = mk_keys("{}/keys/client".format(instance_data['paths']['etc']), instance_data['paths']['dist'])
-        instance_data['keys']['liteserver'] = mk_keys("{}/keys/liteserver".format(instance_data['paths']['etc']), instance_data['paths']['dist'])
+        log(inspect.currentframe().f_code.co_name, 3, "Generating console server, client and {} liteserver keys".format(args.ls_count))
+        ls_basenames = ["{}/keys/liteserver".format(instance_data['paths']['etc'])]
+        for idx in range(1, args.ls_count):
+            ls_basenames.append("{}/keys/liteserver{}".format(instance_data['paths']['etc'], idx))
+
+        keys = mk_keys_batch(["{}/keys/server".format(instance_data['paths']['etc']),
+                              "{}/keys/client".format(instance_data['paths']['etc'])] + ls_basenames,
+                             instance_data['paths']['dist'])
+        instance_data['keys']['server'] = keys[0]
+        instance_data['keys']['client'] = keys[1]
+        instance_data['keys']['liteservers'] = keys[2:]
+        instance_data['keys']['liteserver'] = instance_data['keys']['liteservers'][0]
 
         log(inspect.currentframe().f_code.co_name, 3, "Moving private keys into node database")
         shutil.move("{}/keys/server".format(instance_data['paths']['etc']), "{}/keyring/{}".format(instance_data['paths']['db'], instance_data['keys']['server'][0]))
-        shutil.move("{}/keys/liteserver".format(instance_data['paths']['etc']), "{}/keyring/{}".format(instance_data['paths']['db'], instance_data['keys']['liteserver'][0]))
+        for basename, element in zip(ls_basenames, instance_data['keys']['liteservers']):
+            shutil.move(basename, "{}/keyring/{}".format(instance_data['paths']['db'], element[0]))
 
         log(inspect.currentframe().f_code.co_name, 3, "Appending lite server configuration")
-        node_config['liteservers'] = [
-            {
-                "@type": "engine.liteServer",
-                "id": instance_data['keys']['liteserver'][1],
-                "port" : instance_data['network']['ls_port']
-            }
-        ]
+        node_config['liteservers'] = []
+        for port, element in zip(instance_data['network']['ls_ports'], instance_data['keys']['liteservers']):
+            node_config['liteservers'].append(
+                {
+                    "@type": "engine.liteServer",
+                    "id": element[1],
+                    "port" : port
+                }
+            )
 
         log(inspect.currentframe().f_code.co_name, 3, "Appending console server configuration")
         node_config['control'] = [
@@ -481,22 +633,29 @@ def run():
         with open(instance_data['configs']['node'], 'w') as fh:
             fh.write(json.dumps(node_config, indent=4))
 
-        log(inspect.currentframe().f_code.co_name, 3, "Creating local node snippet file")
-        local_snip = {
-                "ip": struct.unpack('>i',socket.inet_aton(instance_data['network']['address']))[0],
-                "port": instance_data['network']['ls_port'],
-                "id": {
-                    "@type": "pub.ed25519",
-                    "key": instance_data['keys']['liteserver'][2]
+        log(inspect.currentframe().f_code.co_name, 3, "Creating local node snippet files")
+        local_snips = []
+        for port, element in zip(instance_data['network']['ls_ports'], instance_data['keys']['liteservers']):
+            local_snips.append(
+                {
+                    "ip": struct.unpack('>i',socket.inet_aton(instance_data['network']['address']))[0],
+                    "port": port,
+                    "id": {
+                        "@type": "pub.ed25519",
+                        "key": element[2]
+                    }
                 }
-            }
+            )
         with open(instance_data['configs']['snip'], 'w') as fh:
-            fh.write(json.dumps(local_snip, indent=4))
+            fh.write(json.dumps(local_snips[0], indent=4))
+
+        with open(instance_data['configs']['snips'], 'w') as fh:
+            fh.write(json.dumps(local_snips, indent=4))
 
         log(inspect.currentframe().f_code.co_name, 3, "Creating local node config file")
         with open(instance_data['configs']['global'], 'r') as fh:
             local_config = json.loads(fh.read())
-            local_config['liteservers'] = [local_snip]
+            local_config['liteservers'] = local_snips
 
             with open(instance_data['configs']['local'], 'w') as fw:
                 fw.write(json.dumps(local_config, indent=4))
@@ -525,37 +684,16 @@ def run():
         process.terminate()
     else:
         log(inspect.currentframe().f_code.co_name, 3, "Creating local dht snippet file")
-        local_snip = {
-            "@type": "adnl.addressList",
-            "addrs": [
-                {
-                    "@type": "adnl.address.udp",
-                    "ip": struct.unpack('>i',socket.inet_aton(instance_data['network']['address']))[0],
-                    "port": instance_data['network']['service_port']
-                }
-            ],
-            "version": 0,
-            "reinit_date": 0,
-            "priority": 0,
-            "expire_at": 0
-        }
+        local_snip = mk_dht_address_list(instance_data['network']['address'], instance_data['network']['service_port'])
 
         log(inspect.currentframe().f_code.co_name, 3, "Signing DHT record")
-        process_args = [
-            instance_data['binaries']['generate_random_id'],
-            "-m", "dht",
-            "-k", "{}/keyring/{}".format(
-                instance_data['paths']['db'],
-                os.listdir("{}/keyring".format(instance_data['paths']['db']))[0]
-            ),
-            "-a", json.dumps(local_snip)
-        ]
-        process = subprocess.run(process_args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        if process.returncode > 0:
-            log(inspect.currentframe().f_code.co_name, 1, "Record signature failed: {}".format(process.stderr.decode("utf-8")))
+        try:
+            local_snip = sign_dht_record(instance_data['binaries']['generate_random_id'],
+                                         get_dht_key_file(instance_data['paths']['db']),
+                                         local_snip)
+        except Exception as e:
+            log(inspect.currentframe().f_code.co_name, 1, "Record signature failed: {}".format(e))
             sys.exit(1)
-        else:
-            local_snip = json.loads(process.stdout.decode("utf-8"))
 
         with open(instance_data['configs']['snip'], 'w') as fh:
             fh.write(json.dumps(local_snip, indent=4))
@@ -569,30 +707,14 @@ def run():
                 fw.write(json.dumps(local_config, indent=4))
 
     log(inspect.currentframe().f_code.co_name, 3, "Creating systemd service file")
-    with open('{}/templates/{}.systemd.service'.format(pathlib.Path(__file__).parent, instance_data['mode']), 'r') as fh:
-        process_args = [instance_data['binaries']['process']] + get_node_params(instance_data=instance_data, first_run=True)
-        execstart = " ".join(process_args).strip()
-        if instance_data['setup_params']['use_cronolog']:
-            execstart =  cronolize_cmd(instance_data, execstart)
-
-        service = parse_template(
-            template=fh.read(),
-            stash={
-                '##DESCRIPTION##': "{} service".format(instance_data['name']),
-                '##USER##': instance_data['users']['service']['user'],
-                '##GROUP##': instance_data['users']['service']['group'],
-                '##EXECSTART##': execstart
-            }
-        )
-
-        service_file = '{}/{}.systemd.service'.format(instance_data['paths']['etc'], instance_data['name'])
-        with open(service_file, 'w') as fh:
-            fh.write(service)
+    service_file = '{}/{}.systemd.service'.format(instance_data['paths']['etc'], instance_data['name'])
+    with open(service_file, 'w') as fh:
+        fh.write(mk_service(instance_data))
 
-            if instance_data['setup_params']['install_systemd_service']:
-                log(inspect.currentframe().f_code.co_name, 3, "Installing systemd service {}".format(instance_data['name']))
-                shutil.copy(service_file, '/etc/systemd/system/{}.service'.format(instance_data['name']))
-                subprocess.run(["systemctl", "daemon-reload"])
+    if instance_data['setup_params']['install_systemd_service']:
+        log(inspect.currentframe().f_code.co_name, 3, "Installing systemd service {}".format(instance_data['name']))
+        shutil.copy(service_file, '/etc/systemd/system/{}.service'.format(instance_data['name']))
+        subprocess.run(["systemctl", "daemon-reload"])
 
     log(inspect.currentframe().f_code.co_name, 3, "Creating instance configuration file")
     with open(instance_data['configs']['instance'], 'w') as fh:
@@ -634,6 +756,23 @@ def cronolize_cmd(instance_data, cmd):
         instance_data['setup_params']['cronolog_template']
     )
 
+def mk_service(instance_data):
+    with open('{}/templates/{}.systemd.service'.format(pathlib.Path(__file__).parent, instance_data['mode']), 'r') as fh:
+        process_args = [instance_data['binaries']['process']] + get_node_params(instance_data=instance_data, first_run=True)
+        execstart = " ".join(process_args).strip()
+        if instance_data['setup_params']['use_cronolog']:
+            execstart =  cronolize_cmd(instance_data, execstart)
+
+        return parse_template(
+            template=fh.read(),
+            stash={
+                '##DESCRIPTION##': "{} service".format(instance_data['name']),
+                '##USER##': instance_data['users']['service']['user'],
+                '##GROUP##': instance_data['users']['service']['group'],
+                '##EXECSTART##': execstart
+            }
+        )
+
 def get_node_params(instance_data, daemonize=False, as_string=False, first_run=False):
     stack = []
     stack.append('--db')
@@ -689,6 +828,18 @@ def create_paths(paths, force=False):
     mk_path("{}/keys".format(paths['etc']))
     mk_path("{}/initial".format(paths['backup']))
 
+def find_instance_configs(paths):
+    result = []
+    for path in paths:
+        if os.path.isfile(path):
+            result.append(os.path.realpath(path))
+        else:
+            for root, dirs, files in os.walk(path):
+                if 'instance.config.json' in files:
+                    result.append(os.path.realpath(os.path.join(root, 'instance.config.json')))
+
+    return sorted(set(result))
+
 def mk_path(path, log=None):
     if not os.path.exists(path):
         if log:
@@ -718,6 +869,58 @@ def is_port_in_use(port: int) -> bool:
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         return s.connect_ex(('localhost', port)) == 0
 
+def find_db_processes(db_path):
+    result = []
+    db_path = os.path.realpath(db_path)
+    for process in psutil.process_iter(['cmdline']):
+        cmdline = process.info['cmdline'] or []
+        for idx, element in enumerate(cmdline[:-1]):
+            if element == '--db' and os.path.realpath(cmdline[idx+1]) == db_path:
+                result.append(process)
+                break
+
+    return result
+
+def clone_db(source_path, target_path, threads=1, hardlink=False):
+    jobs = []
+    for root, dirs, files in os.walk(source_path):
+        relpath = os.path.relpath(root, source_path)
+        if relpath == '.':
+            dirs[:] = [element for element in dirs if element not in CLONE_SKIP]
+            files = [element for element in files if element not in CLONE_SKIP]
+
+        mk_path(os.path.join(target_path, relpath))
+        for element in files:
+            jobs.append([os.path.join(root, element), os.path.join(target_path, relpath, element)])
+
+    with ThreadPoolExecutor(max_workers=max(threads, 1)) as executor:
+        return list(executor.map(lambda job: clone_file(job[0], job[1], hardlink), jobs))
+
+def clone_file(source, target, hardlink=False):
+    # RocksDB table files are never modified once written, so clone can share them
+    if hardlink and source.endswith('.sst'):
+        os.link(source, target)
+        return ['hardlink', os.path.getsize(source)]
+
+    with open(source, 'rb') as fs, open(target, 'wb') as ft:
+        try:
+            fcntl.ioctl(ft.fileno(), FICLONE, fs.fileno())
+            method = 'reflink'
+        except OSError:
+            try:
+                while os.copy_file_range(fs.fileno(), ft.fileno(), 1 << 30):
+                    pass
+                method = 'copy_file_range'
+            except OSError:
+                fs.seek(0)
+                ft.seek(0)
+                ft.truncate()
+                shutil.copyfileobj(fs, ft, 1 << 20)
+                method = 'copy'
+
+    shutil.copystat(source, target)
+    return [method, os.path.getsize(target)]
+
 def mk_keys(basename, dist_path, log=None):
     process_args = ["{}/bin/generate-random-id".format(dist_path),
                     "--mode", "keys",
@@ -740,6 +943,99 @@ def mk_keys(basename, dist_path, log=None):
             log(inspect.currentframe().f_code.co_name, 1, "Execution of validator-engine failed: {}".format(e))
         sys.exit(1)
 
+def mk_keys_batch(basenames, dist_path, threads=os.cpu_count(), log=None):
+    with ThreadPoolExecutor(max_workers=max(min(threads, len(basenames)), 1)) as executor:
+        return list(executor.map(lambda basename: mk_keys(basename, dist_path, log), basenames))
+
+def mk_dht_address_list(address, port):
+    return {
+        "@type": "adnl.addressList",
+        "addrs": [
+            {
+                "@type": "adnl.address.udp",
+                "ip": struct.unpack('>i',socket.inet_aton(address))[0],
+                "port": port
+            }
+        ],
+        "version": 0,
+        "reinit_date": 0,
+        "priority": 0,
+        "expire_at": 0
+    }
+
+def get_dht_key_file(db_path):
+    keyring = "{}/keyring".format(db_path)
+    files = {element.upper(): element for element in os.listdir(keyring)}
+    with open("{}/config.json".format(db_path), 'r') as fh:
+        config = json.loads(fh.read())
+
+    for element in config.get('dht', []):
+        name = base64.b64decode(element['id']).hex().upper()
+        if name in files:
+            return "{}/{}".format(keyring, files[name])
+
+    return "{}/{}".format(keyring, files[sorted(files)[0]])
+
+def get_server_address(db_path):
+    with open("{}/config.json".format(db_path), 'r') as fh:
+        config = json.loads(fh.read())
+
+    for element in config.get('addrs', []):
+        if element.get('ip') and element.get('port'):
+            return socket.inet_ntoa(struct.pack('>I', element['ip'] & 0xffffffff)), int(element['port'])
+
+    return None
+
+def sign_dht_record(generate_random_id_bin, key_file, address_list):
+    process_args = [
+        generate_random_id_bin,
+        "-m", "dht",
+        "-k", key_file,
+        "-a", json.dumps(address_list)
+    ]
+    process = subprocess.run(process_args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             timeout=10)
+    if process.returncode > 0:
+        raise Exception(process.stderr.decode("utf-8"))
+
+    return json.loads(process.stdout.decode("utf-8"))
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 20), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+def get_manifest_hash(files):
+    return hashlib.sha256(json.dumps(files, sort_keys=True).encode()).hexdigest()
+
+def check_dist_hash(dist_path, expected):
+    manifest_file = "{}/{}".format(dist_path.rstrip('/'), DIST_MANIFEST)
+    if not os.path.isfile(manifest_file):
+        return "manifest {} does not exist".format(manifest_file)
+    elif len(expected) < 12:
+        return "hash {} is too short".format(expected)
+
+    with open(manifest_file, 'r') as fh:
+        manifest = json.loads(fh.read())
+
+    if get_manifest_hash(manifest['files']) != manifest['hash']:
+        return "manifest is corrupted"
+    elif not manifest['hash'].startswith(expected.lower()):
+        return "artifact hash {} does not match {}".format(manifest['hash'], expected)
+
+    for name, element in manifest['files'].items():
+        path = "{}/{}".format(dist_path.rstrip('/'), name)
+        if 'link' in element:
+            if not os.path.islink(path) or os.readlink(path) != element['link']:
+                return "link {} does not match".format(name)
+        elif not os.path.isfile(path) or os.path.getsize(path) != element['size'] or file_sha256(path) != element['sha256']:
+            return "file {} does not match".format(name)
+
+    return None
+
 def parse_template(template, stash):
     for element in stash:
         template = template.replace(element, stash[element])
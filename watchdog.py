@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+#
+import sys
+import argparse
+import inspect
+import json
+import os
+import re
+import shutil
+import subprocess
+import time
+import setup
+from setup import log, mk_path, mk_service, find_instance_configs, vc_exec
+
+def run():
+    description = 'Watch TON node / dht server instances and restart, throttle or pause them on stalls and crash loops'
+    parser = argparse.ArgumentParser(formatter_class = argparse.RawDescriptionHelpFormatter,
+                                     description = description)
+
+    parser.add_argument('instances',
+                        nargs='+',
+                        type=str,
+                        help='Instance configuration files or directories to search for instance.config.json - REQUIRED')
+
+    parser.add_argument('--interval',
+                        required=False,
+                        type=int,
+                        default=60,
+                        dest='interval',
+                        action='store',
+                        help='Seconds between probes - OPTIONAL, defaults to 60')
+
+    parser.add_argument('--max-lag',
+                        required=False,
+                        type=int,
+                        default=60,
+                        dest='max_lag',
+                        action='store',
+                        help='Masterchain lag in seconds up to which node is considered in sync - OPTIONAL, defaults to 60')
+
+    parser.add_argument('--stall-time',
+                        required=False,
+                        type=int,
+                        default=900,
+                        dest='stall_time',
+                        action='store',
+                        help='Seconds without console response or sync progress before node is considered stalled - OPTIONAL, defaults to 900')
+
+    parser.add_argument('--crash-restarts',
+                        required=False,
+                        type=int,
+                        default=5,
+                        dest='crash_restarts',
+                        action='store',
+                        help='Number of service restarts within crash window considered a crash loop - OPTIONAL, defaults to 5')
+
+    parser.add_argument('--crash-window',
+                        required=False,
+                        type=int,
+                        default=600,
+                        dest='crash_window',
+                        action='store',
+                        help='Crash loop detection window in seconds - OPTIONAL, defaults to 600')
+
+    parser.add_argument('--pause-time',
+                        required=False,
+                        type=int,
+                        default=1800,
+                        dest='pause_time',
+                        action='store',
+                        help='Seconds to keep crash looping service stopped - OPTIONAL, defaults to 1800')
+
+    parser.add_argument('--action-interval',
+                        required=False,
+                        type=int,
+                        default=1800,
+                        dest='action_interval',
+                        action='store',
+                        help='Minimum seconds between two actions on same instance - OPTIONAL, defaults to 1800')
+
+    parser.add_argument('--threads-step',
+                        required=False,
+                        type=int,
+                        default=0,
+                        dest='threads_step',
+                        action='store',
+                        help='Lower service threads by this value when pausing crash looping service - OPTIONAL, defaults to 0 (disabled)')
+
+    parser.add_argument('--capture-size',
+                        required=False,
+                        type=int,
+                        default=256,
+                        dest='capture_size',
+                        action='store',
+                        help='Kilobytes of service log to capture on failure - OPTIONAL, defaults to 256')
+
+    parser.add_argument('--report',
+                        required=False,
+                        type=str,
+                        dest='report',
+                        action='store',
+                        help='Append recovery reports as json lines to file - OPTIONAL')
+
+    parser.add_argument('--dry-run',
+                        required=False,
+                        dest='dry_run',
+                        action='store_true',
+                        help='Only log actions which would be taken - OPTIONAL')
+
+    parser.add_argument('--once',
+                        required=False,
+                        dest='once',
+                        action='store_true',
+                        help='Probe instances once and exit - OPTIONAL')
+
+    parser.add_argument('-v', '--verbosity',
+                        required=False,
+                        type=int,
+                        dest='verbosity',
+                        action='store',
+                        default=3,
+                        help='Verbosity for this script - OPTIONAL')
+
+    args = parser.parse_args()
+    setup.verbosity = args.verbosity
+
+    instances = {}
+    for element in find_instance_configs(args.instances):
+        with open(element, 'r') as fh:
+            instance_data = json.loads(fh.read())
+
+        log(inspect.currentframe().f_code.co_name, 3, "Watching {} instance {}".format(instance_data['mode'], instance_data['name']))
+        instances[instance_data['name']] = {
+            'config': element,
+            'data': instance_data,
+            'restarts': None,
+            'restart_times': [],
+            'last_ok': time.time(),
+            'last_mc_time': None,
+            'last_action': None,
+            'paused_until': None,
+            'recovery': None
+        }
+
+    if not instances:
+        log(inspect.currentframe().f_code.co_name, 1, "No instances found")
+        sys.exit(1)
+
+    while True:
+        for state in instances.values():
+            try:
+                watch(args, state)
+            except Exception as e:
+                log(inspect.currentframe().f_code.co_name, 1, "Watch of {} failed: {}".format(state['data']['name'], e))
+
+        if args.once:
+            break
+
+        time.sleep(args.interval)
+
+def watch(args, state):
+    instance_data = state['data']
+    now = time.time()
+    service = get_service_state(instance_data['name'])
+
+    if state['paused_until']:
+        if now < state['paused_until']:
+            log(inspect.currentframe().f_code.co_name, 3, "{} is paused for {} more seconds".format(
+                instance_data['name'], int(state['paused_until'] - now)))
+            return
+
+        log(inspect.currentframe().f_code.co_name, 2, "{} pause is over, starting service".format(instance_data['name']))
+        state['paused_until'] = None
+        state['restart_times'] = []
+        state['restarts'] = None
+        state['last_ok'] = now
+        service_action(args, instance_data['name'], 'start')
+        return
+
+    if service['state'] in ('inactive', 'deactivating'):
+        # Clean stop by operator (maintenance, database clone), not restarted by systemd either
+        log(inspect.currentframe().f_code.co_name, 3, "{} is stopped, skipping".format(instance_data['name']))
+        state['last_ok'] = now
+        state['last_mc_time'] = None
+        return
+
+    if state['restarts'] is not None and service['restarts'] > state['restarts']:
+        state['restart_times'] += [now] * (service['restarts'] - state['restarts'])
+    state['restarts'] = service['restarts']
+    state['restart_times'] = [element for element in state['restart_times'] if element > now - args.crash_window]
+
+    healthy, reason = probe(args, state, service)
+    if healthy:
+        state['last_ok'] = now
+        if state['recovery']:
+            report(args, state, now)
+        log(inspect.currentframe().f_code.co_name, 3, "{} is healthy: {}".format(instance_data['name'], reason))
+        return
+
+    log(inspect.currentframe().f_code.co_name, 2, "{} is unhealthy: {}".format(instance_data['name'], reason))
+    if len(state['restart_times']) >= args.crash_restarts:
+        if act(args, state, now, 'crash loop: {} restarts in {} seconds'.format(len(state['restart_times']), args.crash_window), 'pause'):
+            if args.threads_step and instance_data['setup_params']['service_threads']:
+                lower_threads(args, state)
+            service_action(args, instance_data['name'], 'stop')
+            state['paused_until'] = now + args.pause_time
+    elif now - state['last_ok'] > args.stall_time:
+        if act(args, state, now, 'stalled for {} seconds: {}'.format(int(now - state['last_ok']), reason), 'restart'):
+            service_action(args, instance_data['name'], 'restart')
+            state['last_ok'] = now
+
+def probe(args, state, service):
+    instance_data = state['data']
+    if service['state'] != 'active':
+        return False, "service is {}".format(service['state'])
+    elif instance_data['mode'] != 'node':
+        return True, "service is active"
+
+    try:
+        stats = get_node_stats(instance_data)
+    except Exception as e:
+        return False, "console is not responding: {}".format(e)
+
+    if 'unixtime' not in stats or 'masterchainblocktime' not in stats:
+        return False, "console returned no sync state"
+
+    lag = int(stats['unixtime']) - int(stats['masterchainblocktime'])
+    progress = state['last_mc_time'] is not None and int(stats['masterchainblocktime']) > state['last_mc_time']
+    state['last_mc_time'] = int(stats['masterchainblocktime'])
+    if lag <= args.max_lag:
+        return True, "in sync, lag {} seconds".format(lag)
+    elif progress:
+        return True, "syncing, lag {} seconds".format(lag)
+    else:
+        return False, "no sync progress, lag {} seconds".format(lag)
+
+def act(args, state, now, reason, action):
+    instance_data = state['data']
+    if state['last_action'] and now - state['last_action'] < args.action_interval:
+        log(inspect.currentframe().f_code.co_name, 2, "{} {}, {} suppressed for {} more seconds".format(
+            instance_data['name'], reason, action, int(state['last_action'] + args.action_interval - now)))
+        return False
+
+    log(inspect.currentframe().f_code.co_name, 1, "{} {}, taking action: {}".format(instance_data['name'], reason, action))
+    capture = None
+    try:
+        capture = capture_log(args, instance_data, action)
+        if capture:
+            log(inspect.currentframe().f_code.co_name, 3, "Captured log tail into {}".format(capture))
+    except Exception as e:
+        log(inspect.currentframe().f_code.co_name, 1, "Log capture of {} failed: {}".format(instance_data['name'], e))
+
+    state['last_action'] = now
+    state['recovery'] = {
+        'instance': instance_data['name'],
+        'reason': reason,
+        'action': action,
+        'started': now,
+        'capture': capture
+    }
+    return True
+
+def report(args, state, now):
+    recovery = state['recovery']
+    recovery['recovered'] = now
+    recovery['duration'] = now - recovery['started']
+    log(inspect.currentframe().f_code.co_name, 3, "{} recovered {:.0f} seconds after {}".format(
+        recovery['instance'], recovery['duration'], recovery['action']))
+
+    if args.report:
+        with open(args.report, 'a') as fh:
+            fh.write("{}\n".format(json.dumps(recovery)))
+
+    state['recovery'] = None
+
+def lower_threads(args, state):
+    instance_data = state['data']
+    threads = max(instance_data['setup_params']['service_threads'] - args.threads_step, 1)
+    log(inspect.currentframe().f_code.co_name, 2, "Lowering threads of {} from {} to {}".format(
+        instance_data['name'], instance_data['setup_params']['service_threads'], threads))
+    if args.dry_run:
+        return
+
+    instance_data['setup_params']['service_threads'] = threads
+    service_file = '{}/{}.systemd.service'.format(instance_data['paths']['etc'], instance_data['name'])
+    with open(service_file, 'w') as fh:
+        fh.write(mk_service(instance_data))
+
+    if instance_data['setup_params']['install_systemd_service']:
+        shutil.copy(service_file, '/etc/systemd/system/{}.service'.format(instance_data['name']))
+        subprocess.run(["systemctl", "daemon-reload"])
+
+    with open(state['config'], 'w') as fh:
+        fh.write(json.dumps(instance_data, indent=4))
+
+def capture_log(args, instance_data, action):
+    candidates = []
+    for element in os.listdir(instance_data['paths']['log']):
+        path = os.path.join(instance_data['paths']['log'], element)
+        if os.path.isfile(path) and element != 'session-logs.log':
+            candidates.append(path)
+
+    if not candidates:
+        return None
+
+    source = max(candidates, key=os.path.getmtime)
+    with open(source, 'rb') as fh:
+        fh.seek(max(os.path.getsize(source) - args.capture_size * 1024, 0))
+        data = fh.read()
+
+    path = "{}/watchdog".format(instance_data['paths']['log'])
+    mk_path(path)
+    target = "{}/{}-{}.log".format(path, time.strftime("%Y%m%d-%H%M%S"), action)
+    with open(target, 'wb') as fh:
+        fh.write(data)
+
+    return target
+
+def get_service_state(name):
+    process = subprocess.run(["systemctl", "show", name, "-p", "ActiveState", "-p", "NRestarts"],
+                             stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=10)
+    result = {'state': 'unknown', 'restarts': 0}
+    for line in process.stdout.decode("utf-8").splitlines():
+        key, _, value = line.partition('=')
+        if key == 'ActiveState':
+            result['state'] = value
+        elif key == 'NRestarts' and value.isdigit():
+            result['restarts'] = int(value)
+
+    return result
+
+def get_node_stats(instance_data):
+    rs = vc_exec(
+        console_bin=instance_data['binaries']['validator_engine_console'],
+        server_address='127.0.0.1',
+        server_port=instance_data['network']['console_port'],
+        server_key="{}/keys/server.pub".format(instance_data['paths']['etc']),
+        client_key="{}/keys/client".format(instance_data['paths']['etc']),
+        cmd='getstats'
+    )
+
+    result = {}
+    for line in rs.splitlines():
+        match = re.match(r'^(\w+)\s+(\S+)\s*$', line)
+        if match:
+            result[match.group(1)] = match.group(2)
+
+    return result
+
+def service_action(args, name, action):
+    log(inspect.currentframe().f_code.co_name, 3, "Running systemctl {} {}".format(action, name))
+    if not args.dry_run:
+        subprocess.run(["systemctl", action, name], timeout=60)
+
+
+if __name__ == '__main__':
+    run()